@@ -0,0 +1,95 @@
+import os
+import threading
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+
+# Налаштування підключення: змінні оточення або .streamlit/secrets.toml
+#   SUPABASE_URL     - адреса проєкту Supabase
+#   SUPABASE_KEY     - ключ для таблиць продажів, KPI та завантаження
+#   SUPABASE_REP_KEY - ключ для даних МП (rep_data)
+
+
+class MissingSettingError(KeyError):
+    def __init__(self, name):
+        self.name = name
+        super().__init__(f"Не задано налаштування {name}: додайте його у змінні оточення "
+                         f"або в .streamlit/secrets.toml")
+
+    def __str__(self):
+        return self.args[0]
+
+
+# Розмір пулу з'єднань (keep-alive) на процес і таймаути запиту: (з'єднання, читання), секунди
+POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "16"))
+HTTP_TIMEOUT = (5, 30)
+
+_lock = threading.Lock()
+_session = None
+_supabase = None
+
+
+def get_setting(name):
+    """Значення налаштування зі змінної оточення або st.secrets; якщо його немає - MissingSettingError."""
+    value = os.environ.get(name)
+    if value:
+        return value
+    try:
+        return st.secrets[name]
+    except (KeyError, FileNotFoundError):
+        raise MissingSettingError(name) from None
+
+
+def rest_url(path):
+    return f"{get_setting('SUPABASE_URL')}/rest/v1/{path}"
+
+
+def rest_headers(key_name="SUPABASE_KEY"):
+    key = get_setting(key_name)
+    return {"apikey": key, "Authorization": f"Bearer {key}"}
+
+
+class TimeoutSession(requests.Session):
+    """Сесія requests з таймаутом за замовчуванням для кожного запиту."""
+
+    def __init__(self, timeout=HTTP_TIMEOUT):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def get_session():
+    """Спільна на процес сесія requests з keep-alive та обмеженим пулом з'єднань."""
+    global _session
+    with _lock:
+        if _session is None:
+            session = TimeoutSession()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, pool_block=True)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+    return _session
+
+
+def get_supabase_client():
+    """Спільний на процес клієнт Supabase поверх одного httpx.Client з пулом з'єднань."""
+    # supabase імпортується лише тут: сторінкам, яким досить requests, він не потрібен
+    import httpx
+    from supabase import create_client, ClientOptions
+
+    global _supabase
+    with _lock:
+        if _supabase is None:
+            connect_timeout, read_timeout = HTTP_TIMEOUT
+            http_client = httpx.Client(
+                limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE),
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            )
+            _supabase = create_client(get_setting("SUPABASE_URL"), get_setting("SUPABASE_KEY"),
+                                      options=ClientOptions(httpx_client=http_client,
+                                                            postgrest_client_timeout=read_timeout))
+    return _supabase
@@ -1,3 +1,7 @@
+import re
+from functools import lru_cache
+
+import numpy as np
 import pandas as pd
 from dictionaries.dictionary_to_clear import (
     remove_values_from_ternopil,
@@ -59,6 +63,81 @@ def replacement_street(text, street_values):
         return text.strip()  # Видаляємо зайві пробіли
 
 
+class MultiReplacer:
+    """
+    Скомпільований набір замін (ключ -> значення) зі збереженням послідовної семантики
+    циклу text.replace(key, value) у порядку словника.
+
+    Усі ключі зібрані в один regex у формі префіксного дерева, тож один прохід по тексту
+    знаходить усі ключі, що в ньому присутні. Заміни застосовуються лише для знайдених
+    ключів у порядку словника; після кожної фактичної заміни текст сканується повторно,
+    бо заміна може утворити або знищити інші ключі.
+    """
+
+    def __init__(self, pairs):
+        self.pairs = [(key, value) for key, value in pairs]
+        self._indices = {}
+        for i, (key, _) in enumerate(self.pairs):
+            self._indices.setdefault(key, []).append(i)
+        keys = [key for key in self._indices if key]
+        # Усі ключі, що починаються в тій самій позиції, є префіксами найдовшого з них
+        self._prefixes = {
+            key: sorted(i for k in keys if key.startswith(k) for i in self._indices[k])
+            for key in keys
+        }
+        self._always = self._indices.get("", [])
+        self._pattern = re.compile(f"(?=({_trie_pattern(keys)}))") if keys else None
+
+    def find(self, text):
+        """Індекси пар, ключі яких присутні в тексті."""
+        found = set(self._always)
+        if self._pattern is not None:
+            for match in self._pattern.finditer(text):
+                found.update(self._prefixes[match.group(1)])
+        return found
+
+    def replace(self, text):
+        last = -1
+        while True:
+            pending = [i for i in self.find(text) if i > last]
+            if not pending:
+                return text
+            last = min(pending)
+            key, value = self.pairs[last]
+            text = text.replace(key, value)
+
+    def shadowed(self):
+        """
+        Пари (раніший ключ, пізніший ключ), де раніший є частиною пізнішого.
+        Тут результат залежить від порядку: пізніший ключ може не спрацювати ніколи.
+        """
+        return [
+            (earlier, later)
+            for i, (earlier, _) in enumerate(self.pairs)
+            for later, _ in self.pairs[i + 1:]
+            if earlier and earlier != later and earlier in later
+        ]
+
+
+def _trie_pattern(keys):
+    trie = {}
+    for key in keys:
+        node = trie
+        for char in key:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in node.items() if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # Жадібний "?" обирає найдовший ключ, що починається в цій позиції
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
 # Витягуємо назву міста
 def extract_city(address):
     # Витягуємо текст до першої коми
@@ -99,13 +178,61 @@ def update_territory_for_city_streets(df, city_name, street_dict, city):
     return df
 
 
+class ProductLineIndex:
+    """
+    Індекс товарних ліній: спершу точний збіг назви з ключем словника, далі
+    найдовший ключ, що входить у назву (один прохід regex-дерева), з кешуванням результату.
+    """
+
+    def __init__(self, products):
+        self.products = dict(products)
+        self._order = {key: i for i, key in enumerate(self.products)}
+        keys = [key for key in self.products if key]
+        self._prefixes = {key: [k for k in keys if key.startswith(k)] for key in keys}
+        self._pattern = re.compile(f"(?=({_trie_pattern(keys)}))") if keys else None
+        self.classify = lru_cache(maxsize=4096)(self._classify)
+
+    def matches(self, name):
+        """Усі ключі словника, що входять у назву, від найдовшого до найкоротшого."""
+        found = set()
+        if self._pattern is not None:
+            for match in self._pattern.finditer(name):
+                found.update(self._prefixes[match.group(1)])
+        return sorted(found, key=lambda key: (-len(key), self._order[key]))
+
+    def _classify(self, name):
+        """Повертає (лінія, знайдені ключі) для назви препарату."""
+        if not isinstance(name, str):
+            return None, []
+        if name in self.products:
+            return self.products[name], [name]
+        found = self.matches(name)
+        return (self.products[found[0]] if found else None), found
+
+    def line(self, name):
+        return self.classify(name)[0]
+
+
+product_line_index = ProductLineIndex(products_dict)
+
+
 # Функція яка визначає приналежність до певної лінії перпарату
 def assign_line_from_product_name(name):
-    if isinstance(name, str):
-        for key in products_dict:
-            if key in name:
-                return products_dict[key]
-    return None
+    return product_line_index.line(name)
+
+
+# Назви без жодного збігу та з кількома збігами в словнику препаратів
+def product_line_issues(names):
+    unmatched, ambiguous = [], {}
+    for name in names:
+        if not isinstance(name, str) or not name:
+            continue
+        line, found = product_line_index.classify(name)
+        if not found:
+            unmatched.append(name)
+        elif len(found) > 1:
+            ambiguous[name] = found
+    return {"unmatched": unmatched, "ambiguous": ambiguous}
 
 
 # Функцію очищення колонки адреси, та отримання нових колонок міста, вулиці та номеру бодинку
@@ -129,34 +256,51 @@ def clean_delivery_address(df, column, region_name, region_values, city_values,
     return df.reset_index(drop=True)
 
 
-def process_filtered_df(df, cities_by_region):
+# Конфігурації очищення для кожного регіону
+region_configs = {
+    "24. Тернопіль": {
+        "region_values": remove_values_from_ternopil,
+        "city_values": replace_ternopil_city_dict,
+        "street_values": replace_ternopil_street_dict,
+        "street_mr": street_ternopil_territory,
+        "territory": territory_ternopil_mr,
+    },
+    "10. Івано-Франк": {
+        "region_values": remove_values_from_frankivsk,
+        "city_values": replace_frankivsk_city_dict,
+        "street_values": replace_frankivsk_street_dict,
+        "street_mr": street_frankivsk_territory,
+        "territory": territory_frankivsk_mr,
+    },
+    "21. Ужгород": {
+        "region_values": [],
+        "city_values": {},
+        "street_values": {},
+        "street_mr": {},
+        "territory": {},
+    },
+}
+
+# Колонки, які додає обробка, у порядку їх появи в рядку
+derived_columns = ["source_file_date", "city", "street", "house_number", "territory", "product_line"]
+
+
+# Дата файлу з назви виду "*_YYYY_MM_DD.xlsx"
+def extract_source_file_date(filename):
+    if not filename:
+        return ""
+    last_15 = filename[-15:]
+    result = last_15[:-5]  # відрізаємо розширення ".xlsx"
+    try:
+        return pd.to_datetime(result, format="%Y_%m_%d").strftime("%Y-%m-%d")
+    except Exception:
+        return ""
+
+
+def _process_rows(df, cities_by_region):
     """
-    Динамічна обробка DataFrame з кількома регіонами.
+    Построкова обробка через df.apply - еталонна реалізація для векторного режиму.
     """
-    # Визначення конфігурацій для регіонів
-    region_configs = {
-        "24. Тернопіль": {
-            "region_values": remove_values_from_ternopil,
-            "city_values": replace_ternopil_city_dict,
-            "street_values": replace_ternopil_street_dict,
-            "street_mr": street_ternopil_territory,
-            "territory": territory_ternopil_mr,
-        },
-        "10. Івано-Франк": {
-            "region_values": remove_values_from_frankivsk,
-            "city_values": replace_frankivsk_city_dict,
-            "street_values": replace_frankivsk_street_dict,
-            "street_mr": street_frankivsk_territory,
-            "territory": territory_frankivsk_mr,
-        },
-        "21. Ужгород": {
-            "region_values": [],
-            "city_values": {},
-            "street_values": {},
-            "street_mr": {},
-            "territory": {},
-        },
-    }
 
     def process_row(row):
         region_name = row.get("region", "")
@@ -172,16 +316,7 @@ def process_filtered_df(df, cities_by_region):
         cleaned_address = cleaned_address.replace(",,", ",")
 
         row["delivery_address"] = cleaned_address
-        filename = df.attrs.get("source_filename", "")
-        if filename:
-            last_15 = filename[-15:]
-            result = last_15[:-5]  # відрізаємо останні 4 символи
-            try:
-                row["source_file_date"] = pd.to_datetime(result, format="%Y_%m_%d").strftime("%Y-%m-%d")
-            except Exception:
-                row["source_file_date"] = ""
-        else:
-            row["source_file_date"] = ""
+        row["source_file_date"] = extract_source_file_date(df.attrs.get("source_filename", ""))
 
         row["city"] = extract_city(cleaned_address).strip().replace(" ", "")
         row["street"] = extract_street(cleaned_address).strip()
@@ -200,3 +335,134 @@ def process_filtered_df(df, cities_by_region):
 
     df = df.apply(process_row, axis=1)
     return df.reset_index(drop=True)
+
+
+# Скомпільовані заміни регіону: видалення, міста, вулиці
+@lru_cache(maxsize=None)
+def compiled_replacers(region_name):
+    config = region_configs[region_name]
+    return (
+        MultiReplacer((val, "") for val in config["region_values"]),
+        MultiReplacer(config["city_values"].items()),
+        MultiReplacer(config["street_values"].items()),
+    )
+
+
+# Векторне очищення адрес: кожна адреса переписується за один прохід на словник
+def _clean_address_column(addresses, region_name):
+    not_str = ~addresses.map(lambda x: isinstance(x, str)).astype(bool)
+    if not_str.any():
+        raise TypeError(f"Некоректне значення адреси: {addresses[not_str].iloc[0]!r}")
+
+    remove, city, street = compiled_replacers(region_name)
+
+    def clean(text):
+        text = remove.replace(text).strip()
+        text = city.replace(text).strip()
+        text = street.replace(text).strip()
+        return text.replace(",,", ",")
+
+    return addresses.astype(object).map(clean)
+
+
+# Класифікуємо лише унікальні назви препаратів і повертаємо результат за кодами
+def _product_line_column(names):
+    codes, uniques = pd.factorize(names.astype(object), use_na_sentinel=False)
+    lines = np.array([assign_line_from_product_name(name) for name in uniques], dtype=object)
+    return pd.Series(lines[codes], index=names.index, dtype=object), uniques
+
+
+# Обробка унікальних адрес регіону: очищення, місто, вулиця, будинок, територія
+def _process_unique_addresses(addresses, region_name, expected_city):
+    config = region_configs[region_name]
+    addresses = _clean_address_column(addresses, region_name)
+    parts = addresses.str.split(",")
+
+    city = parts.str[0].str.strip().str.replace(" ", "", regex=False)
+    street = parts.str[1].fillna("").str.strip()
+    house_number = parts.str[2].fillna("").str.strip()
+
+    territory_dict = config["territory"]
+    territory = city.map(lambda x: territory_dict.get(x, "").strip()).astype(object)
+
+    if expected_city:
+        in_city = city == expected_city
+        unassigned = in_city.copy()
+        for street_key, territory_value in config["street_mr"].items():
+            hits = unassigned & street.str.contains(street_key, regex=False)
+            territory[hits] = territory_value
+            unassigned &= ~hits
+
+    return {
+        "delivery_address": addresses,
+        "city": city,
+        "street": street,
+        "house_number": house_number,
+        "territory": territory,
+    }
+
+
+def _process_columns(df, cities_by_region):
+    """
+    Векторна обробка: рядки групуються за регіоном, адреси та назви препаратів
+    факторизуються, і кожне унікальне значення обробляється один раз.
+    Результат ідентичний _process_rows; статистика унікальності - у df.attrs["dedup_stats"],
+    нерозпізнані та неоднозначні назви препаратів - у df.attrs["product_line_issues"].
+    """
+    if "region" not in df.columns or df.empty:
+        return df.reset_index(drop=True)
+
+    df = df.reset_index(drop=True)
+    known = df["region"].map(lambda x: isinstance(x, str) and x in region_configs).astype(bool)
+    if not known.any():
+        return df
+
+    source_file_date = extract_source_file_date(df.attrs.get("source_filename", ""))
+    result = {col: df[col].astype(object) for col in df.columns}
+    for col in derived_columns:
+        if col not in result:
+            result[col] = pd.Series(None, index=df.index, dtype=object)
+    result["source_file_date"].loc[known] = source_file_date
+
+    distinct_addresses = 0
+    for region_name, group in df[known].groupby("region", sort=False):
+        codes, uniques = pd.factorize(group["delivery_address"].astype(object), use_na_sentinel=False)
+        distinct_addresses += len(uniques)
+        processed = _process_unique_addresses(pd.Series(uniques, dtype=object), region_name,
+                                              cities_by_region.get(region_name))
+        for col, values in processed.items():
+            result[col].loc[group.index] = values.to_numpy()[codes]
+
+    product_names = []
+    if "product_name" in df.columns:
+        lines, product_names = _product_line_column(df.loc[known, "product_name"])
+        result["product_line"].loc[known] = lines
+    distinct_products = len(product_names)
+
+    columns = list(df.columns) + [col for col in derived_columns if col not in df.columns]
+    if not known.all():
+        # df.apply із рядками різної структури повертає колонки в алфавітному порядку
+        columns = sorted(columns)
+    out = pd.DataFrame({col: result[col] for col in columns}).infer_objects()
+
+    rows = int(known.sum())
+    out.attrs = dict(df.attrs)
+    out.attrs["dedup_stats"] = {
+        "rows": rows,
+        "distinct_addresses": distinct_addresses,
+        "distinct_products": distinct_products,
+        "address_ratio": distinct_addresses / rows,
+        "product_ratio": distinct_products / rows,
+    }
+    out.attrs["product_line_issues"] = product_line_issues(product_names)
+    return out
+
+
+def process_filtered_df(df, cities_by_region, vectorized=True):
+    """
+    Динамічна обробка DataFrame з кількома регіонами.
+    За замовчуванням використовується векторний режим; vectorized=False вмикає построкову обробку.
+    """
+    if vectorized:
+        return _process_columns(df, cities_by_region)
+    return _process_rows(df, cities_by_region)
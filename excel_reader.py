@@ -0,0 +1,71 @@
+import pandas as pd
+from openpyxl import load_workbook
+
+
+class MissingColumnsError(ValueError):
+    def __init__(self, missing):
+        self.missing = missing
+        super().__init__(f"У файлі відсутні колонки: {', '.join(missing)}")
+
+
+# Назви колонок як у pd.read_excel: порожні -> "Unnamed: i", повтори -> "назва.1"
+def _header_names(header):
+    names, seen = [], {}
+    for i, value in enumerate(header):
+        name = f"Unnamed: {i}" if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+# Перетворення значення комірки як у pandas: цілі числа з Excel повертаються як int
+def _convert_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def read_excel_streaming(file, required_columns, regions, region_column="Регіон", chunk_size=10_000):
+    """
+    Потокове читання першого аркуша .xlsx через openpyxl у режимі read_only.
+    Рядки інших регіонів відкидаються ще до створення DataFrame, тому пам'ять
+    залежить лише від обсягу обраних регіонів. Порожні значення заповнюються "".
+    """
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        # Відкидаємо порожні комірки в кінці рядка заголовків
+        while header and header[-1] is None:
+            header = header[:-1]
+        columns = _header_names(header)
+
+        missing = [col for col in required_columns if col not in columns]
+        if missing:
+            raise MissingColumnsError(missing)
+
+        width = len(columns)
+        region_idx = columns.index(region_column)
+        regions = set(regions)
+
+        chunks, chunk = [], []
+        for row in rows:
+            if len(row) <= region_idx or row[region_idx] not in regions:
+                continue
+            values = [_convert_value(value) for value in row[:width]]
+            values += [None] * (width - len(values))
+            chunk.append(values)
+            if len(chunk) >= chunk_size:
+                chunks.append(pd.DataFrame(chunk, columns=columns))
+                chunk = []
+        if chunk or not chunks:
+            chunks.append(pd.DataFrame(chunk, columns=columns))
+    finally:
+        workbook.close()
+
+    df = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+    return df.fillna("")
@@ -0,0 +1,130 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Бюджет пам'яті спільного кешу, МБ
+DEFAULT_MAX_MB = int(os.environ.get("FRAME_CACHE_MAX_MB", "1024"))
+
+
+def estimate_nbytes(value):
+    """Приблизний розмір значення в пам'яті: DataFrame/Series з deep=True, контейнери рекурсивно."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_nbytes(k) + estimate_nbytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(estimate_nbytes(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class FrameCache:
+    """
+    Спільний для всіх сесій процесу кеш DataFrame та похідних значень з бюджетом пам'яті.
+    Значення зберігаються один раз і віддаються без копіювання; при перевищенні бюджету
+    витісняються найдавніше використані, записи з ttl застарівають після його спливу.
+    Значення з кешу не можна змінювати на місці: похідні об'єкти (зрізи, нові колонки)
+    завдяки Copy-on-Write pandas не торкаються спільних даних.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._expires = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.hits = self.misses = self.evictions = 0
+
+    @property
+    def nbytes(self):
+        return sum(self._sizes.values())
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries and not self._expired(key)
+
+    def _expired(self, key):
+        expires = self._expires.get(key)
+        return expires is not None and time.monotonic() >= expires
+
+    def _remove(self, key):
+        del self._entries[key]
+        del self._sizes[key]
+        self._expires.pop(key, None)
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _lookup(self, key):
+        with self._lock:
+            if key in self._entries and self._expired(key):
+                self._remove(key)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key]
+        return False, None
+
+    def get(self, key, load, ttl=None):
+        """
+        Значення за ключем; при промаху load() виконується один раз, навіть для паралельних сесій.
+        ttl - час життя запису в секундах (None - до витіснення).
+        """
+        found, value = self._lookup(key)
+        if found:
+            return value
+        with self._key_lock(key):
+            found, value = self._lookup(key)
+            if found:
+                return value
+            value = load()
+            self._store(key, value, ttl)
+        return value
+
+    def _store(self, key, value, ttl=None):
+        size = estimate_nbytes(value)
+        with self._lock:
+            self.misses += 1
+            self._key_locks.pop(key, None)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = value
+            self._sizes[key] = size
+            if ttl is not None:
+                self._expires[key] = time.monotonic() + ttl
+            while self.nbytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, match=lambda key: True):
+        """Видаляє записи, для ключів яких match(key) істинне."""
+        with self._lock:
+            for key in [key for key in self._entries if match(key)]:
+                self._remove(key)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.nbytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+@st.cache_resource
+def get_frame_cache(max_mb=DEFAULT_MAX_MB):
+    """Єдиний екземпляр FrameCache на процес Streamlit."""
+    return FrameCache(max_mb * 1024 * 1024)
+
+
+def shared(key, load, ttl=None):
+    """Кешоване в спільному FrameCache значення: shared(("назва", регіон, фільтри), lambda: ...)."""
+    return get_frame_cache().get(key, load, ttl)
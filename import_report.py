@@ -0,0 +1,64 @@
+"""
+Звіт про час холодного імпорту: що коштує старт home.py і кожна сторінка окремо.
+Кожен замір - окремий процес з python -X importtime, тож кеш модулів не впливає на результат.
+
+    python import_report.py [--top 10]
+"""
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+from page_registry import PAGES
+
+ROOT = Path(__file__).parent
+
+# Що імпортує home.py до першого рендеру; page_registry сам сторінок не імпортує
+STARTUP_MODULES = ["streamlit", "streamlit_option_menu", "page_registry"]
+
+
+def measure(modules):
+    """Сумарний час імпорту modules (мс) та {пакет верхнього рівня: власний час, мс}."""
+    code = "; ".join(f"import {module}" for module in modules)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    total_us, packages = 0, {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # Вкладені імпорти мають додатковий відступ; загальний час - сума імпортів верхнього рівня
+        if not name.startswith("  "):
+            total_us += int(cumulative_us)
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(self_us) / 1000
+    return total_us / 1000, packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=10, help="скільки найважчих пакетів показати")
+    args = parser.parse_args()
+
+    page_modules = [module for _, module, _ in PAGES.values()]
+    rows = [("Старт home.py", STARTUP_MODULES),
+            ("Старт з імпортом усіх сторінок (як раніше)", STARTUP_MODULES + page_modules)]
+    rows += [(f"Сторінка «{name}» ({module})", STARTUP_MODULES + [module])
+             for name, (_, module, _) in PAGES.items()]
+
+    width = max(len(label) for label, _ in rows)
+    results = [measure(modules) for _, modules in rows]
+    for (label, _), (total_ms, _) in zip(rows, results):
+        print(f"{label:<{width}}  {total_ms:8.0f} мс")
+
+    heaviest = results[1][1]
+    print("\nНайважчі пакети при імпорті всіх сторінок (власний час):")
+    for package, ms in sorted(heaviest.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {package:<30} {ms:8.0f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from clients import get_supabase_client
+from frame_cache import shared
+from pagination import fetch_offset
+
+MONTHS = ["Січень", "Лютий", "Березень", "Квітень", "Травень", "Червень",
+          "Липень", "Серпень", "Вересень", "Жовтень", "Листопад", "Грудень"]
+
+# Джерело помісячних підсумків регіонів: "file" (CSV з колонками TOTALS_COLUMNS) або "supabase"
+KPI_SOURCE = os.environ.get("KPI_SOURCE", "file")
+KPI_FILE = Path(os.environ.get("KPI_FILE", Path(__file__).parent / "data" / "region_monthly_totals.csv"))
+KPI_TABLE = "region_monthly_totals"
+TOTALS_COLUMNS = ["region", "year", "month", "units", "amount"]
+
+# Як часто перевіряти, чи змінилась таблиця в Supabase, секунди
+FINGERPRINT_TTL = 60
+
+
+def _read_table():
+    client = get_supabase_client()
+
+    def fetch_page(offset, limit):
+        query = client.table(KPI_TABLE).select(",".join(TOTALS_COLUMNS))
+        for column in ("region", "year", "month"):
+            query = query.order(column)
+        return query.range(offset, offset + limit - 1).execute().data
+
+    return pd.DataFrame(fetch_offset(fetch_page), columns=TOTALS_COLUMNS)
+
+
+def _table_fingerprint():
+    response = get_supabase_client().table(KPI_TABLE).select("updated_at", count="exact") \
+        .order("updated_at", desc=True).limit(1).execute()
+    return response.count, response.data[0]["updated_at"] if response.data else None
+
+
+def data_fingerprint():
+    """Відбиток даних: змінюється разом з файлом або таблицею, тож кеш KPI оновлюється без зміни коду."""
+    if KPI_SOURCE == "supabase":
+        return shared(("kpi_fingerprint",), _table_fingerprint, ttl=FINGERPRINT_TTL)
+    stat = KPI_FILE.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_monthly_totals():
+    """Помісячні підсумки регіонів: region, year, month (1-12), units, amount."""
+    totals = _read_table() if KPI_SOURCE == "supabase" else pd.read_csv(KPI_FILE)
+    return totals[TOTALS_COLUMNS].astype({"year": "int64", "month": "int64",
+                                         "units": "float64", "amount": "float64"})
+
+
+def compute_kpis(totals):
+    """
+    Показники всіх регіонів і років одним групуванням.
+    monthly - повна сітка місяців кожного року регіону в колонках дашборда (порожні місяці - NaN);
+    yearly - підсумки за рік, середній чек та зміна до попереднього року (NaN, якщо його немає).
+    """
+    regions = list(pd.unique(totals["region"]))
+    years = totals.groupby("region", sort=False)["year"].unique()
+    grid = pd.MultiIndex.from_tuples(
+        [(region, year, month) for region in regions for year in sorted(years[region]) for month in range(1, 13)],
+        names=["region", "year", "month"])
+    monthly = totals.groupby(["region", "year", "month"])[["units", "amount"]].sum(min_count=1).reindex(grid)
+
+    yearly = monthly.groupby(level=["region", "year"], sort=False).sum()
+    previous = yearly.rename(index=lambda year: year + 1, level="year").reindex(yearly.index)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for column in ("units", "amount"):
+            yearly[f"{column}_delta"] = (yearly[column] - previous[column]) / previous[column].where(previous[column] != 0)
+    yearly["avg_check"] = yearly["amount"] / yearly["units"]
+
+    monthly = monthly.reset_index()
+    monthly = pd.DataFrame({
+        "region": monthly["region"],
+        "Рік": monthly["year"],
+        "Місяць": pd.Categorical.from_codes(monthly["month"] - 1, categories=MONTHS, ordered=True),
+        "Обсяг (уп.)": monthly["units"],
+        "Сума (грн)": monthly["amount"],
+        "Середній чек": monthly["amount"] / monthly["units"],
+    })
+    return {"regions": regions, "monthly": monthly, "yearly": yearly}
+
+
+def load_kpis():
+    """KPI дашборда; перераховуються лише після зміни даних (data_fingerprint)."""
+    return shared(("kpi", KPI_SOURCE, data_fingerprint()), lambda: compute_kpis(load_monthly_totals()))
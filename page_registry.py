@@ -0,0 +1,16 @@
+import importlib
+
+# Сторінки застосунку: назва в меню -> (іконка, модуль, функція сторінки).
+# Модуль імпортується лише при першому виборі сторінки, тож холодний старт не тягне
+# plotly, matplotlib, supabase та словники інших сторінок.
+PAGES = {
+    "Дашборд продаж": ("house", "script", "main"),
+    "Територія": ("back", "region.district", "show_data_sales"),
+    "Динаміка МП": ("bar-chart", "rep_data.sales_data_rep", "show_data_rep"),
+    "Завантаження даних": ("upload", "upload_csv", "upload_excel"),
+}
+
+
+def show_page(name):
+    _, module, function = PAGES[name]
+    getattr(importlib.import_module(module), function)()
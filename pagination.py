@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_PAGE_SIZE = 1000
+
+
+def fetch_keyset(fetch_page, page_size=DEFAULT_PAGE_SIZE, start_after=None, key="id"):
+    """
+    Посторінкове читання за ключем (key > останній ключ, order by key) замість limit/offset:
+    кожна сторінка коштує однаково незалежно від глибини.
+    fetch_page(last_key, limit) повертає рядки, відсортовані за key; None - перша сторінка.
+    Неповна сторінка означає кінець даних, тож зайвий порожній запит не потрібен.
+    page_size не повинен перевищувати ліміт max-rows сервера (у Supabase за замовчуванням 1000).
+    """
+    all_data, last_key = [], start_after
+    while True:
+        batch = fetch_page(last_key, page_size)
+        all_data.extend(batch)
+        if len(batch) < page_size:
+            return all_data
+        last_key = batch[-1][key]
+
+
+def fetch_offset(fetch_page, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Посторінкове читання за зміщенням для невеликих результатів без унікального ключа
+    (агрегати, distinct). fetch_page(offset, limit) має повертати рядки в стабільному порядку.
+    """
+    all_data, offset = [], 0
+    while True:
+        batch = fetch_page(offset, page_size)
+        all_data.extend(batch)
+        if len(batch) < page_size:
+            return all_data
+        offset += page_size
+
+
+def split_key_range(min_key, max_key, parts):
+    """Ділить [min_key, max_key] на parts суміжних діапазонів [lo, hi) за ключем."""
+    parts = max(1, min(parts, max_key - min_key + 1))
+    step = (max_key - min_key + 1) / parts
+    bounds = [min_key + round(step * i) for i in range(parts)] + [max_key + 1]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def fetch_ranges_parallel(fetch_range, ranges, workers=8):
+    """
+    Завантажує діапазони ключів паралельно на обмеженому пулі потоків.
+    fetch_range((lo, hi)) повертає рядки діапазону; результат склеюється в порядку діапазонів.
+    """
+    if workers <= 1 or len(ranges) <= 1:
+        results = [fetch_range(key_range) for key_range in ranges]
+    else:
+        with ThreadPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+            results = list(pool.map(fetch_range, ranges))
+    return [row for rows in results for row in rows]
@@ -1,39 +1,135 @@
+import math
+
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
-from region.load_data import df_make
+from frame_cache import shared
+from region.load_data import load_sales, load_locations
 
 
 # --- 1. КЕШУВАННЯ ТА ЗАВАНТАЖЕННЯ ДАНИХ ---
-@st.cache_data
-def load_and_prepare_data(region):
+# Розрізи куба продажів; кількість підсумовується в межах кожної комбінації
+CUBE_DIMENSIONS = ['source_file_date', 'territory', 'city', 'street_normalized', 'client', 'delivery_address',
+                   'product_line', 'product_name']
+
+
+def normalize_street(streets: pd.Series) -> pd.Series:
+    return streets.str.strip().str.title().astype('category')
+
+
+def load_and_prepare_data(region, filters=None):
     """
-    Завантажує та попередньо обробляє дані для вказаного регіону.
+    Завантажує сирі рядки регіону (фільтри застосовуються на сервері) та попередньо обробляє їх.
     """
-    df = df_make(region)
+    df = load_sales(region, filters, level="rows")
     if not df.empty:
-        df['source_file_date'] = pd.to_datetime(df['source_file_date'])
-        df['street_normalized'] = df['street'].str.strip().str.title()
+        df['street_normalized'] = normalize_street(df['street'])
     return df
 
 
+def build_sales_cube(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Агрегує рядки до рівня (місяць, декада, територія, місто, вулиця, клієнт, лінія, препарат) -> quantity.
+    Куб має ті самі колонки, що й сирі дані, тож усі подання працюють з ним без змін.
+    """
+    cube = df.groupby(CUBE_DIMENSIONS, observed=True, dropna=False)['quantity'].sum().reset_index()
+    cube['month'] = cube['source_file_date'].dt.strftime('%Y-%m')
+    cube['period_code'] = cube['source_file_date'].dt.day
+    return cube
+
+
+def _frozen(filters):
+    return tuple(sorted((column, tuple(value) if isinstance(value, list) else value)
+                        for column, value in filters.items()))
+
+
+def load_sales_cube(region, filters):
+    """Куб сирих рядків для деталізації за клієнтами; один спільний екземпляр на регіон і фільтри."""
+    def load():
+        df = load_and_prepare_data(region, filters)
+        return df if df.empty else build_sales_cube(df)
+
+    return shared(("sales_cube", region, _frozen(filters)), load)
+
+
+def load_decade_totals(region, filters):
+    """Суми за (місяць, декада, територія, лінія, препарат), пораховані на сервері."""
+    return shared(("decade_totals", region, _frozen(filters)),
+                  lambda: load_sales(region, filters, level="decades"))
+
+
+def build_filter_index(locations: pd.DataFrame) -> dict:
+    """
+    Дерево для каскадних фільтрів: територія -> місто -> нормалізована вулиця -> вулиці як у базі.
+    Опції рахуються через словники, а вибрана вулиця передається на сервер списком вихідних назв.
+    """
+    tree = {}
+    locations = locations.assign(street_normalized=normalize_street(locations['street']))
+    groups = locations.groupby(['territory', 'city', 'street_normalized'], observed=True, dropna=False)['street']
+    for (territory, city, street), raw_streets in groups:
+        tree.setdefault(territory, {}).setdefault(city, {})[street] = raw_streets.dropna().tolist()
+    return {'tree': tree}
+
+
+def load_filter_index(region):
+    return shared(("filter_index", region), lambda: build_filter_index(load_locations(region)))
+
+
+def _children(nodes, key):
+    """Дочірні вузли: усі для key=None, інакше лише вузол key."""
+    if key is None:
+        return [child for node in nodes for child in node.values()]
+    return [node[key] for node in nodes if key in node]
+
+
+def _option_keys(nodes):
+    return sorted({key for node in nodes for key in node if pd.notna(key)})
+
+
+def filter_options(index, territory=None, city=None):
+    """Списки доступних територій, міст і вулиць з урахуванням вищих рівнів фільтра."""
+    territory_nodes = [index['tree']]
+    city_nodes = _children(territory_nodes, territory)
+    street_nodes = _children(city_nodes, city)
+    return _option_keys(territory_nodes), _option_keys(city_nodes), _option_keys(street_nodes)
+
+
+def sales_filters(index, territory=None, city=None, street=None) -> dict:
+    """Фільтри для load_sales (None - без фільтра); вулиця - усі її назви в базі в межах вибору."""
+    filters = {}
+    if territory is not None:
+        filters['territory'] = territory
+    if city is not None:
+        filters['city'] = city
+    if street is not None:
+        leaves = _children(_children(_children([index['tree']], territory), city), street)
+        filters['street'] = sorted({raw for leaf in leaves for raw in leaf})
+    return filters
+
+
+def _with_period_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Додає month та period_code, якщо їх ще немає (у кубі вони вже пораховані)."""
+    if 'month' in df.columns and 'period_code' in df.columns:
+        return df
+    return df.assign(month=df['source_file_date'].dt.strftime('%Y-%m'), period_code=df['source_file_date'].dt.day)
+
+
 # --- 2. ФУНКЦІЇ АНАЛІЗУ ТА ВІЗУАЛІЗАЦІЇ ---
 def analyze_sales_dynamics(raw_df: pd.DataFrame) -> pd.DataFrame:
     """
     Аналізує динаміку продажів, групуючи дані.
     Повертає "плаский" DataFrame з колонками замість рівнів індексу.
     """
-    df = raw_df.copy()
-    df['month'] = df['source_file_date'].dt.strftime('%Y-%m')
-    df['period_code'] = df['source_file_date'].dt.day
+    df = _with_period_columns(raw_df)
 
     pivot_df = df.pivot_table(
         index=['month', 'territory', 'product_line', 'product_name'],
         columns='period_code',
         values='quantity',
-        aggfunc='sum'
+        aggfunc='sum',
+        observed=True
     ).fillna(0)
 
     clean_sales_df = pd.DataFrame(index=pivot_df.index)
@@ -50,62 +146,136 @@ def analyze_sales_dynamics(raw_df: pd.DataFrame) -> pd.DataFrame:
     return clean_sales_df.reset_index()
 
 
-def calculate_and_format_decades(df: pd.DataFrame) -> pd.DataFrame:
+def calculate_decade_sales(df: pd.DataFrame, group_cols=()) -> pd.DataFrame:
+    """
+    Розраховує "чисті" продажі по декадах для всіх місяців, препаратів і груп одночасно.
+    Повертає довгу таблицю (group_cols..., Період, product_name, quantity) лише з додатними значеннями.
+    Якщо в групі є тільки дані на 30 число (без 10 і 20), повертається "Місяць Всього".
+    """
+    group_cols = list(group_cols)
+    columns = group_cols + ['Період', 'product_name', 'quantity']
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+
+    df = _with_period_columns(df)
+    wide = df.groupby(group_cols + ['month', 'product_name', 'period_code'], observed=True)['quantity'] \
+        .sum().unstack('period_code')
+    if wide.empty:
+        return pd.DataFrame(columns=columns)
+
+    # Наявність 10/20/30 числа визначається по всій групі, як у зведеній таблиці для однієї групи
+    present = wide.reindex(columns=[10, 20, 30]).notna()
+    present = present.groupby(level=group_cols, observed=True).transform('any') if group_cols else present.any()
+    month_total_only = np.broadcast_to(np.asarray(present[30] & ~present[20] & ~present[10]), len(wide))
+
+    sales = wide.reindex(columns=[10, 20, 30]).fillna(0)
+    d10, d20, d30 = sales[10].to_numpy(), sales[20].to_numpy(), sales[30].to_numpy()
+    decades = {
+        'Декада 1': np.where(month_total_only, 0, d10),
+        'Декада 2': np.where(month_total_only, 0, d20 - d10),
+        'Декада 3': np.where(month_total_only, 0, d30 - d20),
+        'Місяць Всього': np.where(month_total_only, d30, 0),
+    }
+
+    keys = wide.index.to_frame(index=False)
+    parts = []
+    for label, values in decades.items():
+        mask = values > 0
+        part = keys[mask]
+        part['Період'] = part['month'].astype(str) + f" - {label}"
+        part['quantity'] = values[mask]
+        parts.append(part)
+    long_df = pd.concat(parts, ignore_index=True)
+    long_df['product_name'] = long_df['product_name'].astype(str)
+    return long_df[columns]
+
+
+def calculate_and_format_decades(df: pd.DataFrame, group_cols=()) -> pd.DataFrame:
     """
     Бере DataFrame, розраховує "чисті" продажі по декадах та форматує
     у зведену таблицю з датами в рядках та препаратами в колонках.
     Коректно обробляє місяці з неповними даними.
+    З group_cols повертає одну таблицю для всіх груп з індексом (group_cols..., Період);
+    таблицю окремої групи дає decades_for_group.
     """
-    if df.empty:
+    long_format_df = calculate_decade_sales(df, group_cols)
+    if long_format_df.empty:
         return pd.DataFrame()
 
-    df = df.copy()
-    df['month'] = df['source_file_date'].dt.strftime('%Y-%m')
-    df['period_code'] = df['source_file_date'].dt.day
+    final_pivot = long_format_df.pivot_table(
+        index=list(group_cols) + ['Період'], columns='product_name', values='quantity', aggfunc='sum',
+        observed=True
+    ).fillna(0)
+
+    return final_pivot.sort_index()
 
-    pivot_df = df.pivot_table(
-        index=['month', 'product_name'], columns='period_code',
-        values='quantity', aggfunc='sum'
-    )
 
-    all_data = []
-
-    for month, month_df in pivot_df.groupby(level='month'):
-        has_d10 = 10 in month_df.columns
-        has_d20 = 20 in month_df.columns
-        has_d30 = 30 in month_df.columns
-
-        sales_d10 = month_df.get(10, pd.Series(0, index=month_df.index)).fillna(0)
-        sales_d20 = month_df.get(20, pd.Series(0, index=month_df.index)).fillna(0)
-        sales_d30 = month_df.get(30, pd.Series(0, index=month_df.index)).fillna(0)
-
-        # Спеціальний випадок: є тільки загальна сума за місяць
-        if has_d30 and not has_d20 and not has_d10:
-            for (m, product), quantity in sales_d30.items():
-                if quantity > 0:
-                    all_data.append(
-                        {'Період': f"{month} - Місяць Всього", 'product_name': product, 'quantity': quantity})
-        else:  # Стандартний розрахунок
-            d1 = sales_d10
-            d2 = sales_d20 - sales_d10
-            d3 = sales_d30 - sales_d20
-
-            for (m, product), q1 in d1.items():
-                if q1 > 0: all_data.append({'Період': f"{month} - Декада 1", 'product_name': product, 'quantity': q1})
-            for (m, product), q2 in d2.items():
-                if q2 > 0: all_data.append({'Період': f"{month} - Декада 2", 'product_name': product, 'quantity': q2})
-            for (m, product), q3 in d3.items():
-                if q3 > 0: all_data.append({'Період': f"{month} - Декада 3", 'product_name': product, 'quantity': q3})
-
-    if not all_data:
+def decades_for_group(decades: pd.DataFrame, key) -> pd.DataFrame:
+    """Таблиця декад однієї групи з результату calculate_and_format_decades(df, group_cols)."""
+    if decades.empty:
         return pd.DataFrame()
+    try:
+        group = decades.xs(key, drop_level=True)
+    except KeyError:
+        return pd.DataFrame()
+    return group.loc[:, (group > 0).any()]
 
-    long_format_df = pd.DataFrame(all_data)
-    final_pivot = long_format_df.pivot_table(
-        index='Період', columns='product_name', values='quantity', aggfunc='sum'
-    ).fillna(0)
 
-    return final_pivot.sort_index()
+DECADES = ['Декада 1', 'Декада 2', 'Декада 3']
+
+
+def compare_months(analytics_df: pd.DataFrame, base_month, comparison_month) -> pd.DataFrame:
+    """
+    Порівнює два місяці для всіх територій і товарних ліній одним групуванням.
+    Повертає таблицю з індексом (territory, product_line, product_name): декади обох місяців,
+    підсумки, 'Динаміка' та 'Динаміка %'. Підсумки рахуються лише за декадами, що вже є
+    в місяці порівняння на цій лінії (якщо таких немає - за першою декадою).
+    """
+    keys = ['territory', 'product_line', 'product_name']
+    pair = analytics_df[analytics_df['month'].isin([base_month, comparison_month])]
+    wide = pair.groupby(keys + ['month'], observed=True)[DECADES].sum().unstack('month', fill_value=0)
+    wide = wide.reindex(columns=pd.MultiIndex.from_product([DECADES, [base_month, comparison_month]]),
+                        fill_value=0).sort_index()
+
+    base = wide.xs(base_month, axis=1, level=1)[DECADES].to_numpy()
+    comp = wide.xs(comparison_month, axis=1, level=1)[DECADES]
+    line_totals = comp.groupby(level=['territory', 'product_line'], observed=True).transform('sum')
+    available = (line_totals > 0).to_numpy(copy=True)
+    available[~available.any(axis=1), 0] = True
+    comp = comp.to_numpy()
+
+    table = pd.DataFrame(index=wide.index)
+    for month, values in ((base_month, base), (comparison_month, comp)):
+        for i, decade in enumerate(DECADES):
+            table[f'{decade} ({month})'] = values[:, i]
+    base_total = (base * available).sum(axis=1)
+    comp_total = (comp * available).sum(axis=1)
+    table[f'Підсумок ({base_month})'] = base_total
+    table[f'Підсумок ({comparison_month})'] = comp_total
+    table['Динаміка'] = comp_total - base_total
+    with np.errstate(divide='ignore', invalid='ignore'):
+        table['Динаміка %'] = np.where(base_total == 0, np.where(comp_total > 0, np.inf, 0.0),
+                                       (comp_total - base_total) / base_total * 100)
+    return table
+
+
+def month_comparison(analytics_df, cache_key, base_month, comparison_month):
+    """Кешоване порівняння пари місяців; cache_key - регіон і фільтри, з яких побудовано analytics_df."""
+    return shared(("month_comparison", cache_key, base_month, comparison_month),
+                  lambda: compare_months(analytics_df, base_month, comparison_month))
+
+
+def comparison_for_line(comparison: pd.DataFrame, territory, line) -> pd.DataFrame:
+    """Таблиця порівняння однієї лінії території з індексом product_name."""
+    try:
+        return comparison.xs((territory, line), level=['territory', 'product_line'])
+    except KeyError:
+        return comparison.iloc[:0].droplevel(['territory', 'product_line'])
+
+
+def sales_dynamics(df, cache_key):
+    """Кешований analyze_sales_dynamics для регіону та фільтрів з cache_key."""
+    return shared(("sales_dynamics", cache_key), lambda: analyze_sales_dynamics(df))
 
 
 def create_waterfall_chart(df, base_month, comp_month):
@@ -148,7 +318,7 @@ def create_growth_scatter_plot(df, base_month, comp_month):
 def display_summary_charts(df):
     """Створює та відображає зведені графіки (Bar, Treemaps)."""
     st.header("Загальний аналіз продажів")
-    grouped_by_product = df.groupby("product_name")["quantity"].sum().reset_index()
+    grouped_by_product = df.groupby("product_name", observed=True)["quantity"].sum().reset_index()
     if grouped_by_product.empty:
         st.warning("Немає даних для побудови зведених графіків.")
         return
@@ -172,7 +342,7 @@ def display_summary_charts(df):
         st.plotly_chart(bar_fig, use_container_width=True)
 
     st.header("Структура продажів")
-    grouped_by_line = df.groupby(["product_line", "product_name"])["quantity"].sum().reset_index()
+    grouped_by_line = df.groupby(["product_line", "product_name"], observed=True)["quantity"].sum().reset_index()
     if not grouped_by_line.empty:
         treemap_fig_line = px.treemap(
             grouped_by_line, path=['product_line', 'product_name'], values='quantity', color='quantity',
@@ -196,11 +366,11 @@ def display_mp_sales(df_for_decades, df_for_period_filter):
                 st.info("В обраних даних відсутні товарні лінії.")
             else:
                 line_tabs = st.tabs(unique_product_lines)
+                decades_by_line = calculate_and_format_decades(df_for_decades, ['product_line'])
                 for i, line in enumerate(unique_product_lines):
                     with line_tabs[i]:
-                        line_df = df_for_decades[df_for_decades['product_line'] == line]
                         st.subheader(f"Деталізація продажів для лінії: {line}")
-                        final_pivot = calculate_and_format_decades(line_df)
+                        final_pivot = decades_for_group(decades_by_line, line)
                         if not final_pivot.empty:
                             st.dataframe(final_pivot.style.format("{:.1f}").background_gradient(cmap='Blues', axis=1))
                         else:
@@ -216,45 +386,152 @@ def display_mp_sales(df_for_decades, df_for_period_filter):
             values='quantity',
             index=df_for_period_filter['source_file_date'].dt.date,
             columns='product_name',
-            aggfunc='sum'
+            aggfunc='sum',
+            observed=True
         ).fillna(0)
         st.dataframe(agg_pivot.style.format("{:.1f}").background_gradient(cmap='Greens', axis=1))
 
 
-def display_detailed_view(df_for_decades):
+def _client_decade_tables(df_for_decades):
+    clients = df_for_decades[['client', 'delivery_address']].drop_duplicates().sort_values(by='client')
+    pairs = df_for_decades[['client', 'delivery_address', 'product_line']].dropna().drop_duplicates()
+    lines = {}
+    for client, delivery_address, line in pairs.sort_values(by='product_line').itertuples(index=False):
+        lines.setdefault((client, delivery_address), []).append(line)
+    decades = calculate_and_format_decades(df_for_decades, ['client', 'delivery_address', 'product_line'])
+    return clients, lines, decades
+
+
+def client_decade_tables(df_for_decades, cache_key):
+    """
+    Таблиці декад для всіх клієнтів одним груповим проходом.
+    Кешується за cache_key (регіон і фільтри), сам DataFrame не хешується.
+    """
+    return shared(("client_decades", cache_key), lambda: _client_decade_tables(df_for_decades))
+
+
+def display_detailed_view(df_for_decades, cache_key, page_size_options=(10, 25, 50)):
     """
-    Відображає деталізований перегляд за клієнтами.
+    Відображає деталізований перегляд за клієнтами посторінково, з пошуком.
+    cache_key має однозначно визначати df_for_decades (регіон і фільтри).
     """
     st.header("Деталізований перегляд за клієнтами")
-    unique_clients_addresses = df_for_decades[['client', 'delivery_address']].drop_duplicates().sort_values(by='client')
-    if unique_clients_addresses.empty:
+    clients, lines_by_client, decades = client_decade_tables(df_for_decades, cache_key)
+    if clients.empty:
         st.info("Немає клієнтів, що відповідають фільтрам.")
         return
 
-    for _, row in unique_clients_addresses.iterrows():
-        client_name, delivery_address = row['client'], row['delivery_address']
+    search = st.text_input("Пошук за клієнтом або адресою:", key="client_search").strip().casefold()
+    if search:
+        found = clients['client'].astype(str).str.casefold().str.contains(search, regex=False) | \
+                clients['delivery_address'].astype(str).str.casefold().str.contains(search, regex=False)
+        clients = clients[found]
+        if clients.empty:
+            st.info("Немає клієнтів, що відповідають пошуку.")
+            return
+
+    col1, col2 = st.columns(2)
+    page_size = col1.selectbox("Клієнтів на сторінці:", page_size_options, key="client_page_size")
+    pages = math.ceil(len(clients) / page_size)
+    page = col2.selectbox("Сторінка:", range(1, pages + 1))
+    st.caption(f"Клієнтів: {len(clients)}, сторінка {page} з {pages}")
+
+    page_clients = clients.iloc[(page - 1) * page_size:page * page_size]
+    for client_name, delivery_address in page_clients.itertuples(index=False):
         with st.expander(f"**Клієнт:** {client_name}  |  **Адреса:** {delivery_address}"):
-            client_df_decades = df_for_decades[
-                (df_for_decades['client'] == client_name) & (df_for_decades['delivery_address'] == delivery_address)]
-
             st.subheader("Інформація по декадах")
-            if client_df_decades.empty:
-                st.info("Немає даних для розрахунку по декадах для цього клієнта.")
+            unique_product_lines = lines_by_client.get((client_name, delivery_address), [])
+            if not unique_product_lines:
+                st.info("У цього клієнта немає даних по товарних лініях.")
             else:
-                unique_product_lines = sorted(client_df_decades['product_line'].unique().tolist())
-                if not unique_product_lines:
-                    st.info("У цього клієнта немає даних по товарних лініях.")
+                line_tabs = st.tabs(unique_product_lines)
+                for i, line in enumerate(unique_product_lines):
+                    with line_tabs[i]:
+                        final_pivot = decades_for_group(decades, (client_name, delivery_address, line))
+                        if not final_pivot.empty:
+                            st.dataframe(
+                                final_pivot.style.format("{:.1f}").background_gradient(cmap='Blues', axis=1))
+                        else:
+                            st.info(f"Немає даних про продажі для лінії '{line}'.")
+
+
+@st.fragment
+def display_territory_comparison(analytics_df, filters_key, territory, i):
+    """
+    Порівняння місяців для однієї території. Це фрагмент: зміна місяців перевиконує
+    лише цей блок, а не всю сторінку.
+    """
+    st.subheader(f"Територія: {territory}")
+    territory_df = analytics_df[analytics_df['territory'] == territory]
+
+    months = sorted(territory_df['month'].unique(), reverse=True)
+    if len(months) < 2:
+        st.warning("Для порівняння потрібно мати дані хоча б за два місяці на цій території.")
+        return
+
+    col1, col2 = st.columns(2)
+    base_month = col1.selectbox("Базовий місяць:", months, index=1, key=f"base_month_{i}")
+    comparison_month = col2.selectbox("Місяць для порівняння:", months, index=0, key=f"comp_month_{i}")
+
+    if base_month == comparison_month:
+        st.error("Будь ласка, оберіть два різні місяці.")
+        return
+
+    comparison = month_comparison(analytics_df, filters_key, base_month, comparison_month)
+    product_lines = sorted(territory_df['product_line'].unique())
+    for line in product_lines:
+        with st.expander(f"**Товарна лінія: {line}**", expanded=True):
+            comparison_table = comparison_for_line(comparison, territory, line)
+
+            viz_tab1, viz_tab2, viz_tab3 = st.tabs(
+                ["Детальна таблиця", "Аналіз вкладу (Waterfall)", "Матриця зростання (Scatter)"])
+
+            with viz_tab1:
+                display_cols_order = [
+                    f'Підсумок ({base_month})', f'Підсумок ({comparison_month})', 'Динаміка', 'Динаміка %',
+                    f'Декада 1 ({base_month})', f'Декада 1 ({comparison_month})',
+                    f'Декада 2 ({base_month})', f'Декада 2 ({comparison_month})',
+                    f'Декада 3 ({base_month})', f'Декада 3 ({comparison_month})'
+                ]
+                final_cols = [col for col in display_cols_order if col in comparison_table.columns]
+                st.dataframe(
+                    comparison_table[final_cols].sort_values(by='Динаміка').style
+                    .format(precision=1, thousands=",")
+                    .format('{:+.1f}%', subset=['Динаміка %'])
+                    .background_gradient(cmap='RdYlGn', subset=['Динаміка', 'Динаміка %']))
+
+            with viz_tab2:
+                df_for_waterfall = comparison_table[comparison_table['Динаміка'] != 0]
+                if not df_for_waterfall.empty:
+                    waterfall_fig = create_waterfall_chart(df_for_waterfall, base_month, comparison_month)
+                    st.plotly_chart(waterfall_fig, use_container_width=True)
                 else:
-                    line_tabs = st.tabs(unique_product_lines)
-                    for i, line in enumerate(unique_product_lines):
-                        with line_tabs[i]:
-                            line_df = client_df_decades[client_df_decades['product_line'] == line]
-                            final_pivot = calculate_and_format_decades(line_df)
-                            if not final_pivot.empty:
-                                st.dataframe(
-                                    final_pivot.style.format("{:.1f}").background_gradient(cmap='Blues', axis=1))
-                            else:
-                                st.info(f"Немає даних про продажі для лінії '{line}'.")
+                    st.info("Немає змін для відображення на водоспадній діаграмі.")
+
+            with viz_tab3:
+                if not comparison_table.empty:
+                    scatter_fig = create_growth_scatter_plot(comparison_table, base_month, comparison_month)
+                    st.plotly_chart(scatter_fig, use_container_width=True)
+                else:
+                    st.info("Немає даних для відображення матриці зростання.")
+
+
+def display_decade_dynamics(df_totals, filters_key):
+    """Порівняння місяців по декадах у розрізі територій та товарних ліній."""
+    st.header("Порівняльний аналіз динаміки продажів")
+    st.info("Аналіз проводиться у розрізі територій та товарних ліній.")
+
+    analytics_df = sales_dynamics(df_totals, filters_key)
+    if analytics_df.empty:
+        st.warning("Немає даних для аналізу динаміки.")
+        return
+
+    territories = sorted(analytics_df['territory'].unique())
+    territory_tabs = st.tabs(territories)
+
+    for i, territory in enumerate(territories):
+        with territory_tabs[i]:
+            display_territory_comparison(analytics_df, filters_key, territory, i)
 
 
 # --- ГОЛОВНА ФУНКЦІЯ ДОДАТКУ ---
@@ -268,150 +545,57 @@ def show_data_sales():
     if not selected_region:
         st.stop()
 
-    df_sales = load_and_prepare_data(selected_region)
-    if df_sales.empty:
+    filter_index = load_filter_index(selected_region)
+    if not filter_index['tree']:
         st.warning(f"Немає даних для регіону: {selected_region}")
         st.stop()
 
-    df_filtered = df_sales.copy()
-    unique_territories = ['Усі території'] + sorted(df_filtered['territory'].unique().tolist())
-    selected_territory = st.sidebar.selectbox("Оберіть територію:", unique_territories)
-    if selected_territory != 'Усі території':
-        df_filtered = df_filtered[df_filtered['territory'] == selected_territory]
-
-    unique_cities = ['Усі міста'] + sorted(df_filtered['city'].unique().tolist())
-    selected_city = st.sidebar.selectbox("Оберіть місто:", unique_cities)
-    if selected_city != 'Усі міста':
-        df_filtered = df_filtered[df_filtered['city'] == selected_city]
-
-    unique_streets = ['Усі вулиці'] + sorted(df_filtered['street_normalized'].unique().tolist())
-    selected_street = st.sidebar.selectbox("Оберіть вулицю:", unique_streets)
-    if selected_street != 'Усі вулиці':
-        df_filtered = df_filtered[df_filtered['street_normalized'] == selected_street]
-
-    # Створюємо DataFrame для першої вкладки і застосовуємо до нього фільтр по даті
-    df_for_general_tabs = df_filtered.copy()
-    unique_dates = ['Весь період'] + sorted(df_for_general_tabs['source_file_date'].dt.date.unique().tolist(),
-                                            reverse=True)
+    territories, _, _ = filter_options(filter_index)
+    selected_territory = st.sidebar.selectbox("Оберіть територію:", ['Усі території'] + territories)
+    territory = None if selected_territory == 'Усі території' else selected_territory
+
+    _, cities, _ = filter_options(filter_index, territory)
+    selected_city = st.sidebar.selectbox("Оберіть місто:", ['Усі міста'] + cities)
+    city = None if selected_city == 'Усі міста' else selected_city
+
+    _, _, streets = filter_options(filter_index, territory, city)
+    selected_street = st.sidebar.selectbox("Оберіть вулицю:", ['Усі вулиці'] + streets)
+    street = None if selected_street == 'Усі вулиці' else selected_street
+
+    filters = sales_filters(filter_index, territory, city, street)
+    filters_key = (selected_region, territory, city, street)
+    df_totals = load_decade_totals(selected_region, filters)
+
+    # Суми вже містять усі дати, тож фільтр по даті для першої вкладки застосовується локально
+    dates = df_totals['source_file_date'].dt.date
+    unique_dates = ['Весь період'] + sorted(dates.unique(), reverse=True)
     selected_date_display = st.sidebar.selectbox("Оберіть дату:", unique_dates)
     if selected_date_display != 'Весь період':
-        df_for_general_tabs = df_for_general_tabs[
-            df_for_general_tabs['source_file_date'].dt.date == selected_date_display]
+        df_for_general_tabs = df_totals[dates == selected_date_display]
         date_filter_text = selected_date_display.strftime('%Y-%m-%d')
     else:
+        df_for_general_tabs = df_totals
         date_filter_text = "Весь період"
 
     st.header(f"Показники для: {selected_region}")
     st.info(
         f"Застосовані фільтри: Територія: **{selected_territory}**, Місто: **{selected_city}**, Вулиця: **{selected_street}**, Період: **{date_filter_text}**")
 
+    # Вкладки з on_change="rerun": виконується лише відкрита (tab.open), решта не рахується й не малюється
     tab1, tab2, tab3, tab4 = st.tabs(
-        ["📊 Загальна аналітика", "Продажі МП", "📋 Деталі за клієнтами", "📈 Динаміка декад"])
-
-    with tab1:
-        display_summary_charts(df_for_general_tabs)
-    with tab2:
-        display_mp_sales(df_filtered, df_for_general_tabs)
-    with tab3:
-        display_detailed_view(df_filtered)
-    with tab4:
-        st.header("Порівняльний аналіз динаміки продажів")
-        st.info("Аналіз проводиться у розрізі територій та товарних ліній.")
-
-        analytics_df = analyze_sales_dynamics(df_filtered)
-        if analytics_df.empty:
-            st.warning("Немає даних для аналізу динаміки.")
-            st.stop()
-
-        territories = sorted(analytics_df['territory'].unique())
-        territory_tabs = st.tabs(territories)
-
-        for i, territory in enumerate(territories):
-            with territory_tabs[i]:
-                st.subheader(f"Територія: {territory}")
-                territory_df = analytics_df[analytics_df['territory'] == territory]
-
-                months = sorted(territory_df['month'].unique(), reverse=True)
-                if len(months) < 2:
-                    st.warning("Для порівняння потрібно мати дані хоча б за два місяці на цій території.")
-                    continue
-
-                col1, col2 = st.columns(2)
-                base_month = col1.selectbox("Базовий місяць:", months, index=1, key=f"base_month_{i}")
-                comparison_month = col2.selectbox("Місяць для порівняння:", months, index=0, key=f"comp_month_{i}")
-
-                if base_month == comparison_month:
-                    st.error("Будь ласка, оберіть два різні місяці.")
-                    continue
-
-                product_lines = sorted(territory_df['product_line'].unique())
-                for line in product_lines:
-                    with st.expander(f"**Товарна лінія: {line}**", expanded=True):
-                        base_data_full = territory_df[
-                            (territory_df['month'] == base_month) & (territory_df['product_line'] == line)]
-                        comp_data_full = territory_df[
-                            (territory_df['month'] == comparison_month) & (territory_df['product_line'] == line)]
-
-                        available_decades = ['Декада 1']
-                        if not comp_data_full.empty:
-                            temp_decades = []
-                            if comp_data_full['Декада 1'].sum() > 0: temp_decades.append('Декада 1')
-                            if comp_data_full['Декада 2'].sum() > 0: temp_decades.append('Декада 2')
-                            if comp_data_full['Декада 3'].sum() > 0: temp_decades.append('Декада 3')
-                            if temp_decades: available_decades = temp_decades
-
-                        base_data = base_data_full.drop(columns=['month', 'territory', 'product_line', 'Місяць Всього'])
-                        comp_data = comp_data_full.drop(columns=['month', 'territory', 'product_line', 'Місяць Всього'])
-
-                        comparison_table = pd.merge(base_data, comp_data, on='product_name', how='outer',
-                                                    suffixes=(f' ({base_month})', f' ({comparison_month})')).fillna(0)
-
-                        base_cols = [f'{d} ({base_month})' for d in available_decades]
-                        comp_cols = [f'{d} ({comparison_month})' for d in available_decades]
-
-                        comparison_table[f'Підсумок ({base_month})'] = comparison_table[base_cols].sum(axis=1)
-                        comparison_table[f'Підсумок ({comparison_month})'] = comparison_table[comp_cols].sum(axis=1)
-                        comparison_table['Динаміка'] = comparison_table[f'Підсумок ({comparison_month})'] - \
-                                                       comparison_table[f'Підсумок ({base_month})']
-
-                        def _calc_pct_change(c, p):
-                            if p == 0: return np.inf if c > 0 else 0.0
-                            return (c - p) / p * 100
-
-                        comparison_table['Динаміка %'] = comparison_table.apply(
-                            lambda row: _calc_pct_change(row[f'Підсумок ({comparison_month})'],
-                                                         row[f'Підсумок ({base_month})']), axis=1)
-                        comparison_table.set_index('product_name', inplace=True)
-
-                        viz_tab1, viz_tab2, viz_tab3 = st.tabs(
-                            ["Детальна таблиця", "Аналіз вкладу (Waterfall)", "Матриця зростання (Scatter)"])
-
-                        with viz_tab1:
-                            display_cols_order = [
-                                f'Підсумок ({base_month})', f'Підсумок ({comparison_month})', 'Динаміка', 'Динаміка %',
-                                f'Декада 1 ({base_month})', f'Декада 1 ({comparison_month})',
-                                f'Декада 2 ({base_month})', f'Декада 2 ({comparison_month})',
-                                f'Декада 3 ({base_month})', f'Декада 3 ({comparison_month})'
-                            ]
-                            final_cols = [col for col in display_cols_order if col in comparison_table.columns]
-                            st.dataframe(
-                                comparison_table[final_cols].sort_values(by='Динаміка').style.format(precision=1,
-                                                                                                     thousands=",").format(
-                                    '{:+.1f}%', subset=['Динаміка %']).background_gradient(cmap='RdYlGn',
-                                                                                           subset=['Динаміка',
-                                                                                                   'Динаміка %']))
-
-                        with viz_tab2:
-                            df_for_waterfall = comparison_table[comparison_table['Динаміка'] != 0].copy()
-                            if not df_for_waterfall.empty:
-                                waterfall_fig = create_waterfall_chart(df_for_waterfall, base_month, comparison_month)
-                                st.plotly_chart(waterfall_fig, use_container_width=True)
-                            else:
-                                st.info("Немає змін для відображення на водоспадній діаграмі.")
-
-                        with viz_tab3:
-                            if not comparison_table.empty:
-                                scatter_fig = create_growth_scatter_plot(comparison_table, base_month, comparison_month)
-                                st.plotly_chart(scatter_fig, use_container_width=True)
-                            else:
-                                st.info("Немає даних для відображення матриці зростання.")
+        ["📊 Загальна аналітика", "Продажі МП", "📋 Деталі за клієнтами", "📈 Динаміка декад"],
+        key="district_section", on_change="rerun")
+
+    if tab1.open:
+        with tab1:
+            display_summary_charts(df_for_general_tabs)
+    if tab2.open:
+        with tab2:
+            display_mp_sales(df_totals, df_for_general_tabs)
+    if tab3.open:
+        with tab3:
+            # Сирі рядки потрібні лише тут: клієнти та адреси не входять у серверні суми
+            display_detailed_view(load_sales_cube(selected_region, filters), filters_key)
+    if tab4.open:
+        with tab4:
+            display_decade_dynamics(df_totals, filters_key)
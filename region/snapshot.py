@@ -0,0 +1,114 @@
+import json
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # без pyarrow знімок вимкнено, дані завантажуються з Supabase
+    pa = pq = None
+
+# Каталог локального знімка sales_data_month: region=<регіон>/source_file_date=<дата>/data.parquet
+# та _markers.json з маркерами дат, з якими знімок збігається
+SNAPSHOT_DIR = Path(os.environ.get("SALES_SNAPSHOT_DIR", "data_snapshot"))
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def snapshot_available():
+    return pq is not None
+
+
+def _region_lock(region):
+    with _locks_guard:
+        return _locks.setdefault(region, threading.Lock())
+
+
+def _region_dir(region):
+    return SNAPSHOT_DIR / f"region={region.replace('/', '_')}"
+
+
+def _partition_path(region, source_file_date):
+    return _region_dir(region) / f"source_file_date={source_file_date}" / "data.parquet"
+
+
+def _read_markers(region):
+    path = _region_dir(region) / "_markers.json"
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+
+def _write_atomic(path, write):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def _write_partition(region, source_file_date, rows):
+    table = pa.Table.from_pandas(pd.DataFrame(rows), preserve_index=False)
+    _write_atomic(_partition_path(region, source_file_date), lambda tmp: pq.write_table(table, tmp))
+
+
+def sync_region(region, fetch_markers, fetch_partition, refresh=False, workers=1):
+    """
+    Синхронізація знімка регіону за маркерами дат.
+    fetch_markers() повертає {source_file_date: маркер} - кількість рядків дати та їх останній
+    updated_at (JSON-сумісне значення), fetch_partition(source_file_date) - усі рядки дати.
+    Перечитуються лише дати зі зміненим маркером: нові, дозавантажені, оновлені upsert-ом
+    на місці чи замінені; дати, яких у базі більше немає, видаляються зі знімка.
+    Повертає кількість перечитаних дат.
+    """
+    with _region_lock(region):
+        if refresh:
+            shutil.rmtree(_region_dir(region), ignore_errors=True)
+        local = _read_markers(region)
+        remote = fetch_markers()
+        changed = [source_file_date for source_file_date, marker in remote.items()
+                   if local.get(source_file_date) != marker
+                   or not _partition_path(region, source_file_date).exists()]
+
+        if workers <= 1 or len(changed) <= 1:
+            partitions = [fetch_partition(source_file_date) for source_file_date in changed]
+        else:
+            with ThreadPoolExecutor(max_workers=min(workers, len(changed))) as pool:
+                partitions = list(pool.map(fetch_partition, changed))
+
+        for source_file_date, rows in zip(changed, partitions):
+            if rows:
+                _write_partition(region, source_file_date, rows)
+            else:
+                shutil.rmtree(_partition_path(region, source_file_date).parent, ignore_errors=True)
+        for source_file_date in set(local) - set(remote):
+            shutil.rmtree(_partition_path(region, source_file_date).parent, ignore_errors=True)
+
+        # Маркери пишуться останніми: перерваний синк повторить ті самі дати
+        _write_atomic(_region_dir(region) / "_markers.json", lambda tmp: tmp.write_text(json.dumps(remote)))
+        return len(changed)
+
+
+def load_region_snapshot(region, filters=None):
+    """
+    Читає дати регіону зі знімка (memory-mapped Parquet), впорядковані за id.
+    filters: {колонка: список значень}; за source_file_date читаються лише потрібні файли.
+    """
+    filters = dict(filters or {})
+    dates = filters.pop("source_file_date", None)
+    if dates is None:
+        paths = sorted(_region_dir(region).glob("source_file_date=*/data.parquet"))
+    else:
+        paths = [path for path in (_partition_path(region, d) for d in sorted(set(dates))) if path.exists()]
+    if not paths:
+        return pd.DataFrame()
+    frames = [pq.read_table(path, memory_map=True).to_pandas() for path in paths]
+    df = pd.concat(frames, ignore_index=True)
+    for column, values in filters.items():
+        df = df[df[column].isin(values)]
+    return df.sort_values("id", ignore_index=True) if "id" in df.columns else df
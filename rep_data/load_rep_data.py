@@ -1,40 +1,54 @@
-import requests
 import pandas as pd
-import streamlit as st
+from clients import get_session, rest_url, rest_headers
+from pagination import fetch_keyset, fetch_offset, DEFAULT_PAGE_SIZE
 
-SUPABASE_URL = "https://vimswywxzejgyvxjzuvf.supabase.co"
-SUPABASE_KEY = "9sZSIsImlhdCI6MTc0NTg1OTk0NiwiZXhwIjoyMDYxNDM1OTQ2fQ.31GnQn8Bf_tcM-JXIdP4fk8Hnf3wMEKrhofd4Vy3EiY"
 TABLE_NAME = "sales_data_rep"
+REGIONS_VIEW = "sales_data_rep_regions"
 
-headers = {
-    "apikey": SUPABASE_KEY,
-    "Authorization": f"Bearer {SUPABASE_KEY}",
-}
-
-@st.cache_data
-def fetch_sales_data():
-    all_data = []
-    limit = 1000
-    offset = 0
-
-    while True:
-        response = requests.get(
-            f"{SUPABASE_URL}/rest/v1/{TABLE_NAME}",
-            headers=headers,
-            params={
-                "select": "*",
-                "limit": limit,
-                "offset": offset
-            }
-        )
-        if response.status_code != 200:
-            raise Exception(f"Помилка при отриманні даних: {response.text}")
-
-        data = response.json()
-        if not data:
-            break
-        all_data.extend(data)
-        offset += limit
-
-    df_rep = pd.DataFrame(all_data)
-    return df_rep
\ No newline at end of file
+def _get(resource, params):
+    response = get_session().get(rest_url(resource), headers=rest_headers("SUPABASE_REP_KEY"), params=params)
+    if response.status_code != 200:
+        raise Exception(f"Помилка при отриманні даних: {response.text}")
+    return response.json()
+
+
+def _value_filter(values):
+    """Фільтр PostgREST: eq для одного значення, in.("...") для списку."""
+    if isinstance(values, str):
+        return f"eq.{values}"
+    quoted = ('"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"' for value in values)
+    return f"in.({','.join(quoted)})"
+
+
+def fetch_rep_regions(page_size=DEFAULT_PAGE_SIZE):
+    """Список регіонів sales_data_rep (view sales_data_rep_regions) без завантаження самих даних."""
+    def fetch_page(offset, limit):
+        return _get(REGIONS_VIEW, {"select": "region", "order": "region", "offset": offset, "limit": limit})
+
+    return [row["region"] for row in fetch_offset(fetch_page, page_size)]
+
+
+def fetch_sales_data(regions=None, managers=None, columns="*", page_size=DEFAULT_PAGE_SIZE):
+    """
+    Рядки sales_data_rep з фільтрами на сервері.
+    regions, managers - назва або список назв (None - без фільтра); columns - "*" або список колонок.
+    """
+    if columns != "*":
+        columns = ",".join(dict.fromkeys(["id", *columns]))
+
+    def fetch_page(last_id, limit):
+        params = {
+            "select": columns,
+            "order": "id",
+            "limit": limit
+        }
+        if regions is not None:
+            params["region"] = _value_filter(regions)
+        if managers is not None:
+            params["manager_name"] = _value_filter(managers)
+        if last_id is not None:
+            params["id"] = f"gt.{last_id}"
+        return _get(TABLE_NAME, params)
+
+    df_rep = pd.DataFrame(fetch_keyset(fetch_page, page_size))
+    return df_rep
@@ -1,52 +1,140 @@
+import hashlib
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import streamlit as st
-import matplotlib.pyplot as plt
 import numpy as np
-from .load_rep_data import  fetch_sales_data
+from matplotlib.figure import Figure
+from frame_cache import get_frame_cache, shared
+from .load_rep_data import fetch_sales_data, fetch_rep_regions
+
+MONTH_ORDER = ["Січень", "Лютий", "Березень", "Квітень", "Травень", "Червень",
+               "Липень", "Серпень", "Вересень", "Жовтень", "Листопад", "Грудень"]
+
+# Кількість процесів для попереднього рендеру графіків усіх МП (0 - графіки малюються при відкритті вкладки)
+CHART_WORKERS = int(os.environ.get("REP_CHART_WORKERS", "0"))
+
+# Час життя даних регіону та списку регіонів у кеші, секунди
+REP_CACHE_TTL = int(os.environ.get("REP_CACHE_TTL", "600"))
+
+
+def aggregate_rep_sales(df):
+    """Продажі за (регіон, МП, рік, місяць) одним групуванням."""
+    return df.groupby(['region', 'manager_name', 'year', 'month'], sort=False)['quantity'].sum()
+
+
+def load_rep_regions():
+    return shared(("rep_regions",), fetch_rep_regions, ttl=REP_CACHE_TTL)
+
+
+def load_rep_region(region):
+    """
+    Дані МП регіону, їх агрегат та позиції рядків кожного МП. Завантажуються при першому
+    відкритті вкладки регіону, спільні для всіх сесій і живуть у кеші REP_CACHE_TTL секунд.
+    """
+    def load():
+        df = fetch_sales_data(regions=region)
+        if df.empty:
+            return df, None, {}
+        positions = df.groupby('manager_name', sort=False).indices
+        return df, aggregate_rep_sales(df), positions
+
+    return shared(("rep_region", region), load, ttl=REP_CACHE_TTL)
+
+
+def manager_chart_data(aggregate, region, manager):
+    """Таблиця місяць x рік для графіка МП з агрегату, місяці в календарному порядку."""
+    grouped = aggregate.xs((region, manager), level=['region', 'manager_name']) \
+        .unstack('year', fill_value=0).sort_index(axis=1)
+    grouped.index = pd.CategoricalIndex(grouped.index, categories=MONTH_ORDER, ordered=True)
+    return grouped.sort_index()
+
+
+def render_sales_chart(grouped):
+    """Згрупований стовпчиковий графік продажів по місяцях і роках у PNG."""
+    fig = Figure(layout='constrained')
+    ax = fig.subplots()
+
+    months = grouped.index.tolist()
+    years = grouped.columns.tolist()
+    bar_width = 0.8 / len(years) if len(years) > 0 else 0.8
+    x = np.arange(len(months))
+
+    for i, year in enumerate(years):
+        ax.bar(x + i * bar_width, grouped[year], width=bar_width, label=str(year))
+
+    ax.set_xticks(x + bar_width * (len(years) - 1) / 2 if len(years) > 0 else x)
+    ax.set_xticklabels(months, rotation=45)
+    ax.set_ylabel('quantity')
+    ax.set_title('sales')
+    ax.legend(title='Year')
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+
+def chart_key(grouped):
+    """Ключ графіка - хеш даних МП: однакові дані дають той самий PNG."""
+    return "rep_chart", hashlib.sha1(grouped.to_csv().encode("utf-8")).hexdigest()
+
+
+def manager_chart(grouped):
+    return shared(chart_key(grouped), lambda: render_sales_chart(grouped))
+
+
+def prerender_charts(aggregate, workers=CHART_WORKERS):
+    """Рендерить на пулі процесів графіки всіх МП, яких ще немає в кеші."""
+    cache = get_frame_cache()
+    missing = {}
+    for region, manager in aggregate.index.droplevel(['year', 'month']).unique():
+        grouped = manager_chart_data(aggregate, region, manager)
+        key = chart_key(grouped)
+        if key not in cache:
+            missing.setdefault(key, grouped)
+    if not missing:
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for key, png in zip(missing, pool.map(render_sales_chart, missing.values())):
+            cache.get(key, lambda: png)
+
 
 def show_data_rep():
     try:
-        df = fetch_sales_data()
-        unique_regions = df['region'].unique()
-        region_tabs = st.tabs(list(unique_regions))
+        unique_regions = load_rep_regions()
+        if not unique_regions:
+            st.info("Немає даних по МП.")
+            return
+
+        # Вкладки з on_change="rerun": завантажується й малюється лише відкритий регіон і МП
+        region_tabs = st.tabs(unique_regions, key="rep_region", on_change="rerun")
 
         for region_tab, region in zip(region_tabs, unique_regions):
+            if not region_tab.open:
+                continue
             with region_tab:
                 st.header(f"Регіон: {region}")
-                region_df = df[df["region"] == region]
-                unique_managers = region_df["manager_name"].unique()
-                manager_tabs = st.tabs(list(unique_managers))
+                df, aggregate, positions = load_rep_region(region)
+                if df.empty:
+                    st.info("Немає даних для регіону.")
+                    continue
+                if CHART_WORKERS > 0:
+                    prerender_charts(aggregate)
+
+                unique_managers = list(positions)
+                manager_tabs = st.tabs(unique_managers, key=f"rep_manager_{region}", on_change="rerun")
                 for manager_tab, manager in zip(manager_tabs, unique_managers):
+                    if not manager_tab.open:
+                        continue
                     with manager_tab:
                         st.subheader(f"МП: {manager}")
-                        manager_df = region_df[region_df["manager_name"] == manager]
                         with st.expander("Таблиця"):
+                            manager_df = df.iloc[positions[manager]]
                             st.dataframe(manager_df.drop(columns=["id","name","region_code"]).reset_index(drop=True), hide_index=True)
-                        fig, ax = plt.subplots(layout='constrained')
-
-                        # Prepare data for grouped bar chart
-                        grouped = manager_df.groupby(['month', 'year'])['quantity'].sum().unstack(fill_value=0)
-
-                        month_order = ["Січень", "Лютий", "Березень", "Квітень", "Травень", "Червень",
-                                       "Липень", "Серпень", "Вересень", "Жовтень", "Листопад", "Грудень"]
-                        grouped.index = pd.CategoricalIndex(grouped.index, categories=month_order, ordered=True)
-                        grouped = grouped.sort_index()
-
-                        months = grouped.index.tolist()
-                        years = grouped.columns.tolist()
-                        bar_width = 0.8 / len(years) if len(years) > 0 else 0.8
-                        x = np.arange(len(months))
-
-                        for i, year in enumerate(years):
-                            ax.bar(x + i * bar_width, grouped[year], width=bar_width, label=str(year))
-
-                        ax.set_xticks(x + bar_width * (len(years) - 1) / 2 if len(years) > 0 else x)
-                        ax.set_xticklabels(months, rotation=45)
-                        ax.set_ylabel('quantity')
-                        ax.set_title('sales')
-                        ax.legend(title='Year')
 
-                        st.pyplot(fig)
+                        st.image(manager_chart(manager_chart_data(aggregate, region, manager)))
 
     except Exception as e:
-        st.error(str(e))
\ No newline at end of file
+        st.error(str(e))
@@ -0,0 +1,2 @@
+-- Індекси для посторінкового читання за id (pagination.fetch_keyset)
+create index if not exists sales_data_month_region_id_idx on sales_data_month (region, id);
@@ -0,0 +1,28 @@
+-- Помісячні підсумки регіонів для дашборда (kpi.py, KPI_SOURCE=supabase)
+create table if not exists region_monthly_totals (
+    region text not null,
+    year integer not null,
+    month integer not null check (month between 1 and 12),
+    units numeric,
+    amount numeric,
+    updated_at timestamptz not null default now(),
+    primary key (region, year, month)
+);
+
+-- updated_at разом з кількістю рядків - відбиток даних, за яким дашборд оновлює кеш
+create or replace function region_monthly_totals_touch()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+drop trigger if exists region_monthly_totals_touch on region_monthly_totals;
+create trigger region_monthly_totals_touch
+    before insert or update on region_monthly_totals
+    for each row execute function region_monthly_totals_touch();
+
+create index if not exists region_monthly_totals_updated_at_idx on region_monthly_totals (updated_at);
@@ -0,0 +1,8 @@
+-- Регіони sales_data_rep для вкладок сторінки "Динаміка МП" (rep_data/load_rep_data.py: fetch_rep_regions)
+create or replace view sales_data_rep_regions as
+select distinct region
+from sales_data_rep;
+
+-- Завантаження регіону/МП посторінково за id (fetch_sales_data)
+create index if not exists sales_data_rep_region_id_idx on sales_data_rep (region, id);
+create index if not exists sales_data_rep_region_manager_id_idx on sales_data_rep (region, manager_name, id);
@@ -0,0 +1,73 @@
+-- Ключі для ідемпотентного завантаження (uploader.upsert_records)
+alter table sales_data_month add column if not exists row_key text;
+alter table sales_data_month add column if not exists content_hash text;
+create unique index if not exists sales_data_month_row_key_idx on sales_data_month (row_key);
+create index if not exists sales_data_month_source_file_date_idx on sales_data_month (source_file_date);
+
+-- Backfill рядків, завантажених до появи row_key. Ключ рахується так само, як uploader.add_row_keys:
+-- sha1 від полів ROW_KEY_COLUMNS, з'єднаних символом 0x1f.
+-- content_hash = 'legacy' не збігається з жодним справжнім хешем, тож наступний upsert дати
+-- один раз перезапише ці рядки значеннями з файлу.
+create extension if not exists pgcrypto with schema extensions;
+
+begin;
+
+create temporary table legacy_keys on commit drop as
+select id,
+       encode(extensions.digest(concat_ws(chr(31), coalesce(source_file_date::text, ''), coalesce(client, ''),
+                                          coalesce(delivery_address, ''), coalesce(product_name, ''),
+                                          coalesce(distributor, '')), 'sha1'), 'hex') as row_key
+from sales_data_month
+where row_key is null;
+
+-- Старі копії рядків, які вже завантажені з ключем, - це подвійний облік
+delete from sales_data_month s
+using legacy_keys l
+where s.id = l.id
+  and exists (select 1 from sales_data_month k where k.row_key = l.row_key);
+
+-- Рядки з однаковим ключем зливаються в рядок з найменшим id сумуванням quantity, як у add_row_keys
+with groups as (
+    select l.row_key, min(l.id) as keep_id, sum(s.quantity) as quantity
+    from legacy_keys l
+    join sales_data_month s on s.id = l.id
+    group by l.row_key
+)
+update sales_data_month s
+set quantity = g.quantity,
+    row_key = g.row_key,
+    content_hash = 'legacy'
+from groups g
+where s.id = g.keep_id;
+
+delete from sales_data_month s
+using legacy_keys l
+where s.id = l.id
+  and s.row_key is null;
+
+commit;
+
+-- Атомарна заміна даних дати для регіонів, що є у p_rows (uploader.replace_partition)
+create or replace function replace_sales_partition(p_source_file_date date, p_rows jsonb)
+returns integer
+language plpgsql
+as $$
+declare
+    inserted integer;
+begin
+    delete from sales_data_month
+    where source_file_date = p_source_file_date
+      and region in (select distinct r.region from jsonb_populate_recordset(null::sales_data_month, p_rows) r);
+
+    insert into sales_data_month (distributor, region, city, client, delivery_address, product_name, quantity,
+                                  source_file_date, street, house_number, territory, product_line,
+                                  row_key, content_hash)
+    select distributor, region, city, client, delivery_address, product_name, quantity,
+           source_file_date, street, house_number, territory, product_line,
+           row_key, content_hash
+    from jsonb_populate_recordset(null::sales_data_month, p_rows);
+
+    get diagnostics inserted = row_count;
+    return inserted;
+end;
+$$;
@@ -0,0 +1,46 @@
+-- Фільтрація та агрегація на сервері для сторінки district (region/load_data.py: load_sales, load_locations)
+
+-- Територія/місто/вулиця регіону для каскадних фільтрів сайдбару
+create or replace view sales_data_month_locations as
+select distinct region, territory, city, street
+from sales_data_month;
+
+create index if not exists sales_data_month_region_location_idx
+    on sales_data_month (region, territory, city, street);
+
+-- Суми кількості за (місяць, декада, територія, лінія, препарат) з фільтрами сайдбару.
+-- null у параметрі - без фільтра; масив - збіг з будь-яким значенням.
+create or replace function sales_decade_totals(
+    p_region text,
+    p_territory text[] default null,
+    p_city text[] default null,
+    p_street text[] default null,
+    p_source_file_date date[] default null
+)
+returns table (
+    source_file_date date,
+    month text,
+    period_code integer,
+    territory text,
+    product_line text,
+    product_name text,
+    quantity double precision
+)
+language sql
+stable
+as $$
+    select s.source_file_date,
+           to_char(s.source_file_date, 'YYYY-MM'),
+           extract(day from s.source_file_date)::integer,
+           s.territory,
+           s.product_line,
+           s.product_name,
+           sum(s.quantity)::double precision
+    from sales_data_month s
+    where s.region = p_region
+      and (p_territory is null or s.territory = any (p_territory))
+      and (p_city is null or s.city = any (p_city))
+      and (p_street is null or s.street = any (p_street))
+      and (p_source_file_date is null or s.source_file_date = any (p_source_file_date))
+    group by s.source_file_date, s.territory, s.product_line, s.product_name;
+$$;
@@ -0,0 +1,27 @@
+-- Маркери змін дат для локального знімка (region/snapshot.py: sync_region).
+-- upsert оновлює рядки на місці зі старими id, тож зміни видно лише за updated_at.
+alter table sales_data_month add column if not exists updated_at timestamptz not null default now();
+
+create or replace function sales_data_month_touch()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+drop trigger if exists sales_data_month_touch on sales_data_month;
+create trigger sales_data_month_touch
+    before insert or update on sales_data_month
+    for each row execute function sales_data_month_touch();
+
+-- Кількість рядків дати ловить видалення, останній updated_at - вставки та оновлення
+create or replace view sales_data_month_partitions as
+select region, source_file_date, count(*) as row_count, max(updated_at) as updated_at
+from sales_data_month
+group by region, source_file_date;
+
+create index if not exists sales_data_month_region_date_updated_idx
+    on sales_data_month (region, source_file_date, updated_at);
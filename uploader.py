@@ -0,0 +1,196 @@
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from clients import get_session
+
+# Статуси, після яких запит варто повторити
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def chunk_records(records, max_chunk_bytes=512 * 1024):
+    """
+    Ділить записи на JSON-масиви розміром не більше max_chunk_bytes.
+    Запис, більший за ліміт, іде окремим чанком. Повертає список (кількість, тіло запиту).
+    """
+    chunks, parts, size = [], [], 2
+    for record in records:
+        part = json.dumps(record, ensure_ascii=False).encode("utf-8")
+        if parts and size + len(part) + 1 > max_chunk_bytes:
+            chunks.append((len(parts), b"[" + b",".join(parts) + b"]"))
+            parts, size = [], 2
+        parts.append(part)
+        size += len(part) + 1
+    if parts:
+        chunks.append((len(parts), b"[" + b",".join(parts) + b"]"))
+    return chunks
+
+
+def _retry_delay(response, attempt, backoff):
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return backoff * 2 ** attempt
+
+
+def post_chunk(session, url, headers, body, rows=0, index=0, max_retries=5, backoff=0.5, timeout=30):
+    """Відправляє один чанк з експоненційною затримкою при 429/5xx та мережевих помилках."""
+    started = time.monotonic()
+    attempt, response, error = 0, None, ""
+    while True:
+        try:
+            response = session.post(url, headers=headers, data=body, timeout=timeout)
+            error = "" if response.ok else response.text
+            if response.status_code not in RETRY_STATUSES:
+                break
+        except (requests.ConnectionError, requests.Timeout) as e:
+            response, error = None, str(e)
+        if attempt >= max_retries:
+            break
+        time.sleep(_retry_delay(response, attempt, backoff))
+        attempt += 1
+
+    return {
+        "chunk": index,
+        "rows": rows,
+        "bytes": len(body),
+        "status": response.status_code if response is not None else None,
+        "ok": response is not None and response.ok,
+        "attempts": attempt + 1,
+        "seconds": round(time.monotonic() - started, 3),
+        "error": error,
+    }
+
+
+def upload_records(records, url, headers, session=None, workers=4, max_chunk_bytes=512 * 1024,
+                   max_retries=5, backoff=0.5, timeout=30):
+    """
+    Паралельно завантажує записи в таблицю PostgREST/Supabase.
+    Повертає звіт по кожному чанку в порядку чанків; помилка одного чанка не зупиняє інші.
+    """
+    session = session or get_session()
+    chunks = chunk_records(records, max_chunk_bytes)
+
+    def send(item):
+        index, (rows, body) = item
+        return post_chunk(session, url, headers, body, rows=rows, index=index,
+                          max_retries=max_retries, backoff=backoff, timeout=timeout)
+
+    if workers <= 1:
+        return [send(item) for item in enumerate(chunks)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(send, enumerate(chunks)))
+
+
+# Поля, що однозначно визначають рядок файлу декади
+ROW_KEY_COLUMNS = ["source_file_date", "client", "delivery_address", "product_name", "distributor"]
+
+
+def _digest(values):
+    return hashlib.sha1("\x1f".join(str(value) for value in values).encode("utf-8")).hexdigest()
+
+
+def add_row_keys(records):
+    """
+    Додає до записів row_key (хеш ключових полів) та content_hash (хеш решти полів).
+    Записи з однаковим ключем об'єднуються сумуванням quantity, щоб ключ був унікальним.
+    """
+    merged = {}
+    for record in records:
+        record = {k: v for k, v in record.items() if k not in ("id", "row_key", "content_hash")}
+        key = _digest(record.get(col, "") for col in ROW_KEY_COLUMNS)
+        if key in merged:
+            merged[key]["quantity"] = merged[key].get("quantity", 0) + record.get("quantity", 0)
+        else:
+            merged[key] = record
+
+    keyed = []
+    for key, record in merged.items():
+        record["row_key"] = key
+        record["content_hash"] = _digest(f"{k}={record[k]}" for k in sorted(record) if k != "row_key")
+        keyed.append(record)
+    return keyed
+
+
+def has_unkeyed_rows(session, url, headers, source_file_date, timeout=30):
+    """Чи є у даті рядки без row_key (завантажені до міграції і не заповнені backfill)."""
+    params = {"select": "id", "source_file_date": f"eq.{source_file_date}", "row_key": "is.null", "limit": 1}
+    response = session.get(url, headers=headers, params=params, timeout=timeout)
+    if response.status_code != 200:
+        raise Exception(f"Помилка при отриманні даних: {response.text}")
+    return bool(response.json())
+
+
+def fetch_existing_hashes(session, url, headers, source_file_date, page_size=1000, timeout=30):
+    """{row_key: content_hash} для вже завантажених рядків дати; сторінки за row_key."""
+    existing, last_key = {}, None
+    while True:
+        params = {
+            "select": "row_key,content_hash",
+            "source_file_date": f"eq.{source_file_date}",
+            # Рядки з NULL ключем йдуть в кінці сортування і зупинили б посторінкове читання
+            "row_key": "not.is.null" if last_key is None else f"gt.{last_key}",
+            "order": "row_key",
+            "limit": page_size,
+        }
+        response = session.get(url, headers=headers, params=params, timeout=timeout)
+        if response.status_code != 200:
+            raise Exception(f"Помилка при отриманні даних: {response.text}")
+        batch = response.json()
+        existing.update((row["row_key"], row["content_hash"]) for row in batch)
+        if len(batch) < page_size:
+            return existing
+        last_key = batch[-1]["row_key"]
+
+
+def upsert_records(records, url, headers, session=None, **upload_options):
+    """
+    Ідемпотентне завантаження: відправляються лише нові та змінені рядки,
+    змінені оновлюються за row_key. Повторне завантаження того самого файлу нічого не відправляє.
+    Повертає (звіт по чанках, підсумок).
+    """
+    session = session or get_session()
+    keyed = add_row_keys(records)
+
+    to_send, summary = [], {"new": 0, "changed": 0, "unchanged": 0}
+    for date in sorted({record.get("source_file_date", "") for record in keyed}):
+        # Рядки без ключа upsert не бачить - їх копії додались би поруч зі старими
+        if has_unkeyed_rows(session, url, headers, date):
+            raise Exception(f"За {date} є рядки без row_key: виконайте backfill із "
+                            f"sql/sales_data_month_upsert.sql або замініть дані за дату файлу")
+        existing = fetch_existing_hashes(session, url, headers, date)
+        for record in keyed:
+            if record.get("source_file_date", "") != date:
+                continue
+            old_hash = existing.get(record["row_key"])
+            if old_hash == record["content_hash"]:
+                summary["unchanged"] += 1
+                continue
+            summary["new" if old_hash is None else "changed"] += 1
+            to_send.append(record)
+
+    upsert_headers = dict(headers, Prefer="resolution=merge-duplicates,return=minimal")
+    report = upload_records(to_send, f"{url}?on_conflict=row_key", upsert_headers, session=session,
+                            **upload_options)
+    return report, summary
+
+
+def replace_partition(records, rpc_url, headers, session=None, timeout=120):
+    """
+    Атомарно замінює дані дат (source_file_date) у регіонах з records однією транзакцією
+    через функцію replace_sales_partition (див. sql/sales_data_month_upsert.sql).
+    """
+    session = session or get_session()
+    keyed = add_row_keys(records)
+    report = []
+    for date in sorted({record.get("source_file_date", "") for record in keyed}):
+        rows = [record for record in keyed if record.get("source_file_date", "") == date]
+        body = json.dumps({"p_source_file_date": date, "p_rows": rows}, ensure_ascii=False).encode("utf-8")
+        report.append(post_chunk(session, rpc_url, headers, body, rows=len(rows), index=len(report),
+                                 max_retries=2, timeout=timeout))
+    return report